@@ -0,0 +1,51 @@
+import glob
+import os
+import time
+
+import task_buffet
+
+
+BUFFET = 'test_buffet_dedup_retry'
+
+
+def my_task(a, b):
+    time.sleep(0.1)
+
+    # first execution of tasks with a == 2 fails, the retry policy saved in
+    # the buffet puts them back as available
+    marker = '%s_failed_%i_%i' % (BUFFET, a, b)
+    if a == 2 and not os.path.exists(marker):
+        open(marker, 'w').close()
+        raise IOError("Transient failure.")
+
+    print(a + b)
+    return task_buffet.TASK_SUCCESS
+
+
+def main():
+    for f in glob.glob(BUFFET + '*'):
+        os.remove(f)
+
+    # value 2 is repeated, duplicate tasks are only executed once
+    A = [0, 1, 2, 2]
+    B = list(range(5, 10))
+    policy = task_buffet.RetryPolicy(max_attempts=3, backoff=0.2,
+        retry_on=IOError)
+    with task_buffet.TaskBuffet(BUFFET, ['a', 'b'], [A, B], build_grid=True,
+            dedup=True, retry_policy=policy) as buffet:
+        buffet.print_status()
+
+    # workers attach to the buffet with only its name
+    task_buffet.run_mp(2, my_task, buffet_name=BUFFET,
+        fail_on_exception=False)
+
+    with task_buffet.TaskBuffet(BUFFET) as buffet:
+        buffet.print_status(by=['a'])
+        status = buffet.get_original_status()
+        assert len(status) == len(A) * len(B)
+        assert (status == task_buffet.TASK_SUCCESS).all()
+        assert (buffet.task_meta['attempts'] == [0, 0, 1] * len(B)).all()
+
+
+if __name__ == '__main__':
+    main()
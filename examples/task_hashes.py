@@ -0,0 +1,76 @@
+import glob
+import os
+
+import numpy as np
+
+import task_buffet
+from task_buffet import grid, util
+
+
+class Cfg():
+    # equal by value but with the default repr, which contains its address
+    def __init__(self, v):
+        self.v = v
+
+    def __eq__(self, other):
+        return isinstance(other, Cfg) and self.v == other.v
+
+    def scale(self, x):
+        return self.v * x
+
+
+def make_task(v):
+    def task(x):
+        return v * x
+    return task
+
+
+def main():
+    # values with equal canonical keys must get equal hashes
+    pairs = [(1, 1.0), (True, 1), (np.array(1.0), 1), (np.int64(3), 3.0),
+        ([1, 2], (1, 2)), (np.array([1, 2]), [1.0, 2]), ({'a': 1}, {'a': 1.}),
+        (float('nan'), np.nan)]
+    for a, b in pairs:
+        assert util.tasks_eq(a, b), (a, b)
+        assert util.task_hash(a) == util.task_hash(b), (a, b)
+    assert not util.tasks_eq('1', 1)
+
+    # grids with the same tasks are equal whatever the storage of values
+    g = grid.ParamGrid(['x'], [[1, 2]])
+    assert g == grid.ParamGrid(['x'], [[np.array(1), np.array(2)]])
+    assert list(g.find(grid.ParamGrid(['x'], [[np.array(2)]]))) == [1]
+
+    # nan parameters do not make a grid differ from itself
+    g = grid.ParamGrid(['x', 'y'], [[0.1, np.nan], ['a', 'b']], meshgrid=True)
+    assert g == grid.ParamGrid(['x', 'y'], [[0.1, np.nan], ['a', 'b']],
+        meshgrid=True)
+
+    # objects that cannot be serialized are compared with ==
+    assert util.tasks_eq(Cfg(1), Cfg(1))
+    assert util.tasks_eq({'c': [Cfg(1)]}, {'c': (Cfg(1),)})
+    assert not util.tasks_eq(Cfg(1), Cfg(2))
+    assert util.tasks_eq(make_task, make_task)
+    # closures of the same factory, lambdas and methods bound to different
+    # instances do not collapse into a single task
+    for values, n in (([make_task(1), make_task(2), make_task(3)], 3),
+            ([lambda x: x, lambda x: x], 2), ([Cfg(1).scale, Cfg(2).scale], 2),
+            ([Cfg(1), Cfg(2), Cfg(1)], 2)):
+        assert grid.ParamGrid(['f'], [values], dedup=True).nvals == n, values
+    g = grid.ParamGrid(['c'], [[Cfg(1), Cfg(2)]])
+    assert g == grid.ParamGrid(['c'], [[Cfg(1), Cfg(2)]])
+    assert list(g.find(grid.ParamGrid(['c'], [[Cfg(2), Cfg(3)]]))) == [1, -1]
+    assert list(g.compare('c', '==', Cfg(2))) == [False, True]
+
+    # a buffet of such objects can be opened again with the same parameters
+    buffet_name = 'test_buffet_objects'
+    for f in glob.glob(buffet_name + '*'):
+        os.remove(f)
+    for values in ([Cfg(1), Cfg(2)], [Cfg(1), Cfg(2)],
+            [Cfg(1), Cfg(2), Cfg(3)]):
+        with task_buffet.TaskBuffet(buffet_name, ['c'], [values]) as buffet:
+            assert buffet.get_size() == len(values)
+    print("Task hashes are consistent.")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,4 +3,6 @@ python3 simple.py &
 python3 simple.py &
 
 wait
+python3 task_hashes.py
+python3 dedup_retry_attach.py
 echo Done.
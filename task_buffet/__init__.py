@@ -1,2 +1,2 @@
-from .buffet import run, run_mp, TaskBuffet
+from .buffet import run, run_mp, TaskBuffet, RetryPolicy, TaskProcessError
 from .buffet import TASK_SUCCESS, TASK_FAILED, TASK_AVAILABLE, TASK_RUNNING
@@ -0,0 +1,262 @@
+'''
+Benchmarks for the lock, storage and scheduling throughput of task buffets.
+
+Run with `python -m task_buffet.benchmark`, results are printed (or saved
+ with --out) as JSON so that they can be compared between versions. Buffets
+ are created in a temporary directory, use --dir to choose the filesystem
+ being measured (e.g. a tmpfs such as /dev/shm, or a local disk).
+'''
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from . import buffet
+from . import grid
+
+
+def noop_task(i):
+    return buffet.TASK_SUCCESS
+
+
+def sleep_task(i, duration):
+    time.sleep(duration)
+    return buffet.TASK_SUCCESS
+
+
+def summarize(times):
+    '''Distribution of a list of durations, in seconds.'''
+    times = np.asarray(times, dtype=float)
+    if len(times) == 0:
+        return {'n': 0}
+    return {'n': len(times), 'mean': times.mean(), 'min': times.min(),
+        'p50': np.percentile(times, 50), 'p90': np.percentile(times, 90),
+        'p99': np.percentile(times, 99), 'max': times.max()}
+
+
+@contextlib.contextmanager
+def quiet():
+    # workers print every task they run, including in subprocesses, so
+    # silence the file descriptor instead of sys.stdout
+    sys.stdout.flush()
+    saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(devnull)
+        os.close(saved)
+
+
+def claim_loop(path, n_claims):
+    '''
+    Claim and complete up to `n_claims` tasks like `run` does, with a no-op
+     task. Returns the time spent waiting for the lock and the time of each
+     claim, from lock request to lock release.
+    '''
+    lock_waits = []
+    claim_times = []
+    for _ in range(n_claims):
+        b = buffet.TaskBuffet(path)
+        t0 = time.time()
+        b.lock.acquire()
+        t1 = time.time()
+        try:
+            b.access_buffet()
+            task_i, _ = b.get_next_free()
+        finally:
+            b.lock.release()
+        lock_waits.append(t1 - t0)
+        claim_times.append(time.time() - t0)
+        if task_i < 0:
+            break
+
+        with buffet.TaskBuffet(path) as b:
+            b.update_task(task_i, buffet.TASK_SUCCESS)
+    return lock_waits, claim_times
+
+
+def _claim_worker(args):
+    return claim_loop(*args)
+
+
+def bench_claims(workdir, n_tasks, n_claims, n_workers):
+    '''Claims per second and lock wait distribution for `n_workers`.'''
+    path = os.path.join(workdir, 'claims_%i' % n_workers)
+    with buffet.TaskBuffet(path, ['i'], [list(range(n_tasks))]):
+        pass
+
+    per_worker = max(1, n_claims // n_workers)
+    t0 = time.time()
+    if n_workers == 1:
+        results = [claim_loop(path, per_worker)]
+    else:
+        with multiprocessing.Pool(n_workers) as p:
+            results = p.map(_claim_worker, [(path, per_worker)] * n_workers)
+    elapsed = time.time() - t0
+
+    lock_waits = np.concatenate([r[0] for r in results])
+    claim_times = np.concatenate([r[1] for r in results])
+    return {'workers': n_workers, 'tasks': n_tasks,
+        'claims': len(claim_times), 'elapsed': elapsed,
+        'claims_per_second': len(claim_times) / elapsed,
+        'lock_wait': summarize(lock_waits),
+        'claim_time': summarize(claim_times)}
+
+
+def bench_storage(workdir, size, repeat):
+    '''Latency of `dump_buffet` and `open_buffet` for a buffet of `size`.'''
+    path = os.path.join(workdir, 'storage_%i' % size)
+    with buffet.TaskBuffet(path, ['a', 'b'],
+            [list(range(size)), ['x'] * size]) as b:
+        dumps = []
+        for _ in range(repeat):
+            t0 = time.time()
+            b.dump_buffet()
+            dumps.append(time.time() - t0)
+
+    b = buffet.TaskBuffet(path)
+    opens = []
+    for _ in range(repeat):
+        t0 = time.time()
+        b.open_buffet()
+        opens.append(time.time() - t0)
+
+    return {'size': size, 'file_bytes': os.path.getsize(path),
+        'dump': summarize(dumps), 'open': summarize(opens)}
+
+
+def bench_merge(workdir, size):
+    '''Cost of merging a buffet of `size` tasks into a grid one task larger.'''
+    path = os.path.join(workdir, 'merge_%i' % size)
+    values = [list(range(size)), ['x'] * size]
+    with buffet.TaskBuffet(path, ['a', 'b'], values):
+        pass
+
+    new_values = [values[0] + [size], values[1] + ['y']]
+    t0 = time.time()
+    with quiet():
+        with buffet.TaskBuffet(path, ['a', 'b'], new_values):
+            pass
+    merge = time.time() - t0
+
+    g = grid.ParamGrid(['a', 'b'], new_values)
+    t0 = time.time()
+    g == grid.ParamGrid(['a', 'b'], new_values)
+    compare = time.time() - t0
+
+    return {'size': size, 'merge': merge, 'compare': compare}
+
+
+def bench_makespan(workdir, n_tasks, n_workers, duration):
+    '''Time to run `n_tasks` tasks sleeping `duration` with `n_workers`.'''
+    name = 'noop' if duration == 0 else 'sleep'
+    path = os.path.join(workdir, 'makespan_%s_%i' % (name, n_workers))
+    if duration == 0:
+        task = noop_task
+        names, values = ['i'], [list(range(n_tasks))]
+    else:
+        task = sleep_task
+        names, values = ['i', 'duration'], [list(range(n_tasks)),
+            [duration] * n_tasks]
+
+    t0 = time.time()
+    with quiet():
+        if n_workers == 1:
+            buffet.run(task, names, values, path)
+        else:
+            buffet.run_mp(n_workers, task, names, values, buffet_name=path)
+    makespan = time.time() - t0
+
+    # fraction of the worker time spent in tasks, meaningless for no-op tasks
+    efficiency = None
+    if duration > 0:
+        efficiency = n_tasks * duration / (makespan * n_workers)
+    return {'task': name, 'duration': duration, 'tasks': n_tasks,
+        'workers': n_workers, 'makespan': makespan,
+        'tasks_per_second': n_tasks / makespan, 'efficiency': efficiency}
+
+
+def run_benchmarks(workdir, sizes, max_workers, n_tasks, n_claims, sleep,
+        repeat):
+    workers = [w for w in (1, 2, 4, 8, 16, 32, 64) if w < max_workers]
+    workers.append(max_workers)
+
+    results = {'time': time.time(), 'python': platform.python_version(),
+        'numpy': np.__version__, 'platform': platform.platform(),
+        'workdir': workdir}
+    results['claims'] = [bench_claims(workdir, n_tasks, n_claims, w)
+        for w in workers]
+    results['storage'] = [bench_storage(workdir, s, repeat) for s in sizes]
+    results['merge'] = [bench_merge(workdir, s) for s in sizes]
+    results['makespan'] = [bench_makespan(workdir, n_tasks, w, d)
+        for d in (0, sleep) for w in workers]
+    return results
+
+
+def default_dir():
+    # prefer a tmpfs so that the disk does not dominate measurements
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm'
+    return None
+
+
+def to_builtin(o):
+    if isinstance(o, np.generic):
+        return o.item()
+    raise TypeError("Cannot serialize %r" % o)
+
+
+def main():
+    parser = argparse.ArgumentParser("task-buffet-benchmark")
+    parser.add_argument("--dir", default=default_dir(),
+        help="Directory in which temporary buffets are created, defaults to"
+        " /dev/shm when available.")
+    parser.add_argument("--sizes", type=lambda s: [int(v) for v in s.split(",")],
+        default=[1000, 10000, 100000],
+        help="Comma separated buffet sizes for storage and merge benchmarks.")
+    parser.add_argument("--workers", type=int,
+        default=multiprocessing.cpu_count(),
+        help="Maximum number of local workers, benchmarks run with powers of"
+        " two up to this number.")
+    parser.add_argument("--tasks", type=int, default=200,
+        help="Number of tasks for claim and makespan benchmarks.")
+    parser.add_argument("--claims", type=int, default=200,
+        help="Total number of claims for the claim benchmark.")
+    parser.add_argument("--sleep", type=float, default=0.01,
+        help="Duration of sleep tasks, in seconds.")
+    parser.add_argument("--repeat", type=int, default=5,
+        help="Repetitions of storage measurements.")
+    parser.add_argument("--out", help="Save results to this file instead of"
+        " printing them.")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='task_buffet_bench_', dir=args.dir)
+    try:
+        results = run_benchmarks(workdir, args.sizes, args.workers,
+            args.tasks, args.claims, args.sleep, args.repeat)
+    finally:
+        shutil.rmtree(workdir)
+
+    out = json.dumps(results, indent=2, default=to_builtin)
+    if args.out is None:
+        print(out)
+    else:
+        with open(args.out, 'w') as f:
+            f.write(out + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -27,12 +27,9 @@ Note: since everything hangs on a file based locking mechanism, this probably
 
 import bz2
 import functools
-import logging
-import multiprocessing
 import os
 import pickle
 import time
-import traceback
 
 import numpy as np
 
@@ -45,6 +42,69 @@ TASK_FAILED = -1
 TASK_SUCCESS = 0
 TASK_AVAILABLE = 1
 TASK_RUNNING = 2
+# order in which status counts are reported
+STATUS_ORDER = [TASK_SUCCESS, TASK_FAILED, TASK_RUNNING, TASK_AVAILABLE]
+STATUS_NAMES = {TASK_SUCCESS: 'finished', TASK_FAILED: 'failed',
+    TASK_RUNNING: 'running', TASK_AVAILABLE: 'available'}
+
+# per task information saved along with the status, name -> default value,
+# only values differing from the default take space in the buffet file
+TASK_META = {
+    # time at which a running task was claimed by a worker
+    'claim_time': np.nan,
+    # duration of the last successful execution of the task, in seconds
+    'runtime': np.nan,
+    # number of failed executions of the task since its last reset, tasks
+    # interrupted or handing themselves back as available are not counted
+    'attempts': 0,
+    # time before which an available task waiting for a retry cannot be
+    # claimed
+    'retry_at': np.nan,
+}
+
+
+class TaskProcessError(Exception):
+    # Raised for tasks run with `mp_timeout` whose process exited with an
+    # error code, e.g. when killed for using too much memory.
+    pass
+
+
+class RetryPolicy:
+    '''
+    Describe how tasks raising an exception are retried by `run`.
+
+    max_attempts: number of failed executions of a task, including the first
+        one, after which it is marked as failed.
+
+    backoff: delay in seconds before a failed task can be claimed again,
+        multiplied by `backoff_factor` after each failed attempt and capped
+        to `max_backoff`.
+
+    retry_on: exception type or tuple of types which are retried, other
+        exceptions fail the task right away. Tasks run with `mp_timeout`
+        whose process exits with an error raise a `TaskProcessError`.
+    '''
+    def __init__(self, max_attempts=3, backoff=0., backoff_factor=2.,
+            max_backoff=None, retry_on=Exception):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.retry_on = retry_on
+
+    def __repr__(self):
+        return ("RetryPolicy(max_attempts=%r, backoff=%r, backoff_factor=%r,"
+            " max_backoff=%r, retry_on=%r)" % (self.max_attempts, self.backoff,
+            self.backoff_factor, self.max_backoff, self.retry_on))
+
+    def should_retry(self, exc, attempts):
+        return attempts < self.max_attempts and isinstance(exc, self.retry_on)
+
+    def delay(self, attempts):
+        delay = self.backoff * self.backoff_factor ** (attempts - 1)
+        if self.max_backoff is not None:
+            delay = min(delay, self.max_backoff)
+        return delay
 
 
 def run_mp(n_worker, task_function, *args, **kwargs):
@@ -53,6 +113,8 @@ def run_mp(n_worker, task_function, *args, **kwargs):
      Processes launched with python multiprocessing. See `run` function for
      a description of the parameters.
     '''
+    import multiprocessing
+
     f = functools.partial(run, task_function, *args, **kwargs)
     p = multiprocessing.Pool(n_worker)
     future_returns = [p.apply_async(f) for i in range(n_worker)]
@@ -70,9 +132,10 @@ def mp_queue_fwrap(out_queue, func, func_kwargs):
     out_queue.put(result)
 
 
-def run(task_function, task_param_names, task_param_values, buffet_name,
-        build_grid=False, fail_on_exception=True, time_budget=None,
-        mp_timeout=False):
+def run(task_function, task_param_names=None, task_param_values=None,
+        buffet_name=None, build_grid=False, fail_on_exception=True,
+        time_budget=None, mp_timeout=False, dedup=False, estimate_by=None,
+        runtime_margin=1., retry_policy=None, override_retry_policy=False):
     '''
     The scripts executing the task buffet should setup the description of the
      tasks to be executed and call this function when ready. This script should
@@ -102,6 +165,10 @@ def run(task_function, task_param_names, task_param_values, buffet_name,
         n_params x n_jobs, with different values for each parameter on each
         column.
 
+    buffet_name: path of the file holding the buffet. If task_param_names and
+        values are not given, the worker attaches to this existing buffet and
+        runs its tasks without rebuilding the grid of parameters.
+
     build_grid: if true, build a mesh grid from the different parameters
         provided in `task_params`
 
@@ -110,6 +177,34 @@ def run(task_function, task_param_names, task_param_values, buffet_name,
         a certain time limit. Processes will exit cleanly and set tasks
         as available again.
 
+    time_budget: time in seconds allowed to this worker. Tasks are only
+        claimed if their estimated runtime fits in the time left, estimates
+        are learned from the runtime of finished tasks. Stops claiming tasks
+        when none is expected to finish in time.
+
+    estimate_by: names of the parameters used to group tasks when estimating
+        runtimes, tasks with the same values are expected to take about the
+        same time. By default all tasks are in the same group.
+
+    runtime_margin: estimated runtimes are multiplied by this factor before
+        comparing them with the time left.
+
+    fail_on_exception: if true, an exception raised by a task is raised again
+        and stops the worker, otherwise the task is marked as failed.
+
+    retry_policy: a `RetryPolicy`, tasks raising exceptions it matches are put
+        back as available, after a delay, until they run out of attempts.
+        Takes precedence over `fail_on_exception`. The policy is saved in the
+        buffet when it is created, and workers then use the saved policy,
+        including workers attaching with only a `buffet_name`.
+
+    override_retry_policy: if true, this worker uses `retry_policy` instead of
+        the policy saved in the buffet.
+
+    dedup: if true, identical tasks (same parameters) are only executed once.
+        See `TaskBuffet.get_original_status` to get the status of every
+        original task.
+
     Notes:
     ------
 
@@ -121,7 +216,13 @@ def run(task_function, task_param_names, task_param_values, buffet_name,
     time_start = time.time()
     out_of_time = False
 
-    if hasattr(task_function, 'keywords'):
+    if buffet_name is None:
+        raise Exception("A buffet_name must be given.")
+    if task_param_names is None and not os.path.exists(buffet_name):
+        raise Exception("Buffet %s does not exist, task_param_names and"
+            " values are needed to create it." % buffet_name)
+
+    if hasattr(task_function, 'keywords') and task_param_names is not None:
         for key in task_function.keywords.keys():
             if key in task_param_names:
                 raise Exception("Keyword specified in wrapped original"
@@ -129,6 +230,7 @@ def run(task_function, task_param_names, task_param_values, buffet_name,
 " manually. Add a flag or something.")
 
     task_i = 0
+    time_left = None
     while task_i >= 0:
         if time_budget is not None:
             time_left = time_budget - (time.time() - time_start)
@@ -139,20 +241,52 @@ def run(task_function, task_param_names, task_param_values, buffet_name,
 
         # Next call locks the buffet
         with TaskBuffet(buffet_name, task_param_names, task_param_values,
-                build_grid=build_grid) as buffet:
-            task_i, task_p = buffet.get_next_free()
-            if task_i < 0:
-                continue
+                build_grid=build_grid, dedup=dedup,
+                retry_policy=retry_policy) as buffet:
+            task_i, task_p = buffet.get_next_free(time_left, estimate_by,
+                runtime_margin)
+            # The buffet now matches our parameters, no need to rebuild and
+            # compare grids for the next claims
+            task_param_names = task_param_values = None
+
+            wait = None
+            if task_i >= 0:
+                # failed executions so far, counting this one if it fails
+                attempts = buffet.task_meta['attempts'][task_i] + 1
+                policy = retry_policy if override_retry_policy else \
+                    buffet.get_retry_policy()
+            else:
+                retry_at = buffet.next_retry_time()
+                if retry_at is not None and (time_left is None or
+                        retry_at - time.time() < time_left):
+                    wait = max(0., retry_at - time.time())
+                elif time_left is not None and \
+                        np.any(buffet.task_status == TASK_AVAILABLE):
+                    print("No task expected to finish in the %.1fs left." %
+                        time_left)
+                    out_of_time = True
+                    break
         # Release buffet/lock
 
+        if wait is not None:
+            print("Waiting %.1fs for failed tasks to be retried." % wait)
+            time.sleep(wait)
+            task_i = 0
+            continue
+        if task_i < 0:
+            continue
+
         print("Running task with parameters: %s" % task_p)
         # Will not force a task to exit, because that would require a separate
         # process. Give the time left to the task_func and let it handle it
         if time_budget is not None and not mp_timeout:
             task_p['time_left'] = time_left
 
+        task_start = time.time()
+        exc = None
         try:
             if mp_timeout:
+                import multiprocessing
                 out_queue = multiprocessing.Queue()
                 proc = multiprocessing.Process(target=mp_queue_fwrap,
                     args=(out_queue, task_function, task_p))
@@ -167,25 +301,42 @@ def run(task_function, task_param_names, task_param_values, buffet_name,
                 elif proc.exitcode != 0:
                     status = TASK_FAILED
                     print("Job exited with code %i" % proc.exitcode)
+                    exc = TaskProcessError("Job exited with code %i" %
+                        proc.exitcode)
                 else:
                     status = out_queue.get()
             else:
                 status = task_function(**task_p)
             if status not in [TASK_FAILED, TASK_SUCCESS, TASK_AVAILABLE]:
                 raise Exception("Wrong status returned.")
-        except Exception as exc:
-            if fail_on_exception:
+        except Exception as e:
+            exc = e
+            status = TASK_FAILED
+            if fail_on_exception and (policy is None or
+                    not policy.should_retry(exc, attempts)):
                 print("Caught exception in job %s, stopping." % task_p)
                 raise
-            else:
-                print("Job %s failed with exception %s, marking as failed." %
-                    (task_p, exc))
-                print(traceback.format_exc())
-                status = TASK_FAILED
+            import traceback
+            print(traceback.format_exc())
+
+        retry_at = None
+        if exc is not None and policy is not None and \
+                policy.should_retry(exc, attempts):
+            delay = policy.delay(attempts)
+            print("Job %s failed with exception %s (attempt %i of %i), will"
+                " retry in %.1fs." % (task_p, exc, attempts,
+                policy.max_attempts, delay))
+            status = TASK_AVAILABLE
+            retry_at = time.time() + delay
+        elif status == TASK_FAILED and exc is not None:
+            print("Job %s failed with exception %s, marking as failed." %
+                (task_p, exc))
 
         # Lock buffet again to update it
         with TaskBuffet(buffet_name) as buffet:
-            buffet.update_task(task_i, status)
+            runtime = time.time() - task_start \
+                if status == TASK_SUCCESS else None
+            buffet.update_task(task_i, status, runtime, retry_at)
 
     if out_of_time:
         print("Ran out of time.")
@@ -195,9 +346,64 @@ def run(task_function, task_param_names, task_param_values, buffet_name,
         return False
 
 
+def new_task_meta(n):
+    return {k: np.full(n, v, dtype=float) for k, v in TASK_META.items()}
+
+
+def pack_task_meta(task_meta):
+    '''
+    Compact form of the task meta saved in buffet files. Each array is saved
+     as (ids, base, values), with `ids` the tasks whose value differs from
+     the default, or None when most tasks differ and all values are saved.
+     Times are saved as float32 offsets from `base`, attempts as the smallest
+     unsigned integer type holding them.
+    '''
+    packed = {}
+    for k, v in task_meta.items():
+        default = TASK_META.get(k, np.nan)
+        is_set = ~np.isnan(v) if np.isnan(default) else v != default
+        n_set = np.count_nonzero(is_set)
+        if n_set * 2 < len(v):
+            ids = np.flatnonzero(is_set).astype(np.min_scalar_type(len(v)))
+            values = v[ids]
+        else:
+            ids, values = None, v
+        if k == 'attempts':
+            base = 0.
+            values = values.astype(np.min_scalar_type(int(values.max(
+                initial=0))))
+        else:
+            base = float(np.nanmin(values)) if n_set > 0 else 0.
+            values = (values - base).astype(np.float32)
+        packed[k] = (ids, base, values)
+    return packed
+
+
+def unpack_task_meta(packed, n):
+    '''
+    Inverse of `pack_task_meta`, returns one float array of length `n` per
+     meta, with the default value of missing meta.
+    '''
+    task_meta = new_task_meta(n)
+    for k, v in packed.items():
+        if isinstance(v, np.ndarray):
+            # buffets saved by older versions store the full arrays
+            task_meta[k] = v.astype(float)
+            continue
+        ids, base, values = v
+        values = values.astype(float) + base
+        if ids is None:
+            task_meta[k] = values
+        else:
+            task_meta.setdefault(k, np.full(n, TASK_META.get(k, np.nan)))
+            task_meta[k][ids] = values
+    return task_meta
+
+
 class TaskBuffet:
     def __init__(self, buffet_name, task_param_names=None,
-            task_param_values=None, build_grid=False):
+            task_param_values=None, build_grid=False, dedup=False,
+            retry_policy=None):
 
         self.name = os.path.split(buffet_name)[-1]
         self.dir = os.path.abspath(os.path.split(buffet_name)[0])
@@ -210,6 +416,11 @@ class TaskBuffet:
             os.makedirs(self.dir, exist_ok=True)
 
         self.build_grid = build_grid
+        self.dedup = dedup
+        # kept pickled so that buffets can be opened, and saved again, where
+        # the exception types of the policy cannot be imported
+        self.retry_policy_data = None if retry_policy is None else \
+            pickle.dumps(retry_policy)
         self.lock = file_lock.Locker(self.path)
 
     def __enter__(self):
@@ -241,25 +452,32 @@ class TaskBuffet:
 
         # task_params contains the raw data for the tasks to execute, whereas
         # buffet will contain the status of each task
-        self.task_params = grid.ParamGrid(self.task_param_names,
-            self.task_param_values, meshgrid=self.build_grid)
+        self.task_params = self.build_task_params()
 
         self.task_status = np.ones(self.task_params.nvals, dtype=int) * TASK_AVAILABLE
+        self.task_meta = new_task_meta(self.task_params.nvals)
         self.dump_buffet()
 
+    def build_task_params(self):
+        return grid.ParamGrid(self.task_param_names, self.task_param_values,
+            meshgrid=self.build_grid, dedup=self.dedup)
+
     def dump_buffet(self):
         f = bz2.open(self.path, 'wb')
         pickle.dump(self.task_status, f)
         pickle.dump(self.task_params, f)
+        pickle.dump(pack_task_meta(self.task_meta), f)
+        pickle.dump(self.retry_policy_data, f)
         f.close()
 
     def open_buffet(self):
-        # Find filetype
-        try:
+        # Find filetype from the header of bz2 files, older buffets were not
+        # compressed
+        with open(self.path, 'rb') as f:
+            compressed = f.read(3) == b'BZh'
+        if compressed:
             f = bz2.open(self.path, 'rb')
-            f.read()
-            f.seek(0)
-        except:
+        else:
             f = open(self.path, 'rb')
 
         self.task_status = pickle.load(f)
@@ -270,7 +488,17 @@ class TaskBuffet:
                 " buffet or something is wrong. Will not be able to"
                 " launch new tasks.")
             self.task_params = None
+        try:
+            task_meta = pickle.load(f)
+        except:
+            # buffets saved by older versions do not have task meta
+            task_meta = {}
+        try:
+            self.retry_policy_data = pickle.load(f)
+        except:
+            self.retry_policy_data = None
         f.close()
+        self.task_meta = unpack_task_meta(task_meta, len(self.task_status))
 
         # Check for compatibility with whatever buffet was loaded
         self.check_merge_buffets()
@@ -281,10 +509,9 @@ class TaskBuffet:
         '''
         if self.task_param_names is not None:
             saved_g = self.task_params
-            new_g = grid.ParamGrid(self.task_param_names,
-                self.task_param_values, self.build_grid)
+            new_g = self.build_task_params()
 
-            if util.tasks_eq(saved_g, new_g):
+            if saved_g == new_g:
                 # Task buffets identical, nothing to see here carry on
                 return
             elif not merge:
@@ -296,39 +523,192 @@ class TaskBuffet:
                 new_task_status = np.ones(new_g.nvals, dtype=int)\
                     * TASK_AVAILABLE
 
-                for p in range(saved_g.nvals):
-                    saved_p = saved_g[p]
-                    i = 0
-                    while not util.tasks_eq(saved_p, new_g[i]):
-                        i += 1
-                        if i == new_g.nvals:
-                            raise Exception("Unable to find match for a task"
-                                " while merging buffets: %s" % saved_p)
-                    logging.debug("Match for saved_g %i is new_g %i" % (p, i))
-                    new_task_status[i] = self.task_status[p]
+                # match tasks through their hashes, all at once
+                match = new_g.find(saved_g)
+                if np.any(match < 0):
+                    p = np.where(match < 0)[0][0]
+                    raise Exception("Unable to find match for a task"
+                        " while merging buffets: %s" % saved_g[int(p)])
+                import logging
+                logging.debug("Matches for saved_g in new_g: %s" % match)
+                new_task_status[match] = self.task_status
+                merged_meta = new_task_meta(new_g.nvals)
+                for k, v in merged_meta.items():
+                    v[match] = self.task_meta[k]
                 self.task_status = new_task_status
+                self.task_meta = merged_meta
                 self.task_params = new_g
                 self.dump_buffet()
 
-    def get_next_free(self):
+    def get_next_free(self, time_left=None, estimate_by=None, margin=1.):
+        '''
+        Claim the first available task. If `time_left` is given, only tasks
+         whose estimated runtime (see `estimate_runtimes`) times `margin` fits
+         in the time left are considered, tasks without estimates always fit.
+        '''
         if self.task_params is None:
             raise Exception("Uninitialized task_params, cannot return free"
                 " params.")
 
-        free = np.where(self.task_status == TASK_AVAILABLE)[0]
+        # tasks waiting for a retry cannot be claimed before their delay
+        free = np.where((self.task_status == TASK_AVAILABLE) &
+            ~(self.task_meta['retry_at'] > time.time()))[0]
+        if time_left is not None and len(free) > 0:
+            est = self.estimate_runtimes(estimate_by)[free]
+            free = free[~(est * margin > time_left)]
         if len(free) == 0:
             return -1, {}
         else:
             i = free[0]
             self.task_status[i] = TASK_RUNNING
+            self.task_meta['claim_time'][i] = time.time()
             self.dump_buffet()
             return i, self.task_params[i]
 
-    def update_task(self, task_i, status):
+    def get_retry_policy(self):
+        '''
+        Returns the `RetryPolicy` saved in the buffet, or None.
+        '''
+        if self.retry_policy_data is None:
+            return None
+        return pickle.loads(self.retry_policy_data)
+
+    def update_task(self, task_i, status, runtime=None, retry_at=None):
         self.task_status[task_i] = status
+        if status != TASK_RUNNING:
+            # keep meta of tasks that are not running or waiting at their
+            # default so that they take no space in the buffet file
+            self.task_meta['claim_time'][task_i] = np.nan
+        self.task_meta['retry_at'][task_i] = np.nan if retry_at is None \
+            else retry_at
+        if runtime is not None:
+            self.task_meta['runtime'][task_i] = runtime
+        if status == TASK_FAILED or retry_at is not None:
+            # only failures use up retry attempts
+            self.task_meta['attempts'][task_i] += 1
         self.dump_buffet()
 
-    def print_status(self, ):
+    def next_retry_time(self):
+        '''
+        Returns the earliest time at which an available task waiting for a
+         retry can be claimed, or None if no task is waiting.
+        '''
+        waiting = (self.task_status == TASK_AVAILABLE) & \
+            (self.task_meta['retry_at'] > time.time())
+        if not np.any(waiting):
+            return None
+        return self.task_meta['retry_at'][waiting].min()
+
+    def select(self, status=None, ids=None, where=None, lease_age=None):
+        '''
+        Returns the ids of the tasks matching all the given selectors, all
+         evaluated at once on the whole buffet. When the buffet was created
+         with `dedup`, ids are those of the canonical tasks (see
+         `ParamGrid.task_map`), not the positions in the original grid.
+
+        status: list of task status.
+
+        ids: list of task ids.
+
+        where: list of (name, op, value) predicates on task parameters, where
+            op is one of ==, !=, <, <=, > or >=.
+
+        lease_age: only running tasks claimed more than `lease_age` seconds
+            ago.
+        '''
+        mask = np.ones(self.get_size(), dtype=bool)
+        if status is not None:
+            mask &= np.isin(self.task_status, status)
+        if ids is not None:
+            ids = np.asarray(ids, dtype=int)
+            out = ids[(ids < 0) | (ids >= self.get_size())]
+            if len(out) > 0:
+                raise Exception("Task ids %s are out of range, buffet %s has"
+                    " %i tasks." % (out.tolist(), self.name, self.get_size()))
+            in_ids = np.zeros(self.get_size(), dtype=bool)
+            in_ids[ids] = True
+            mask &= in_ids
+        if where is not None:
+            for name, op, value in where:
+                mask &= self.task_params.compare(name, op, value)
+        if lease_age is not None:
+            age = time.time() - self.task_meta['claim_time']
+            mask &= (self.task_status == TASK_RUNNING) & (age >= lease_age)
+        return np.where(mask)[0]
+
+    def set_status(self, ids, status):
+        '''
+        Set the status of all tasks in `ids`, without saving the buffet, call
+         `dump_buffet` once done. Tasks made available get a fresh set of
+         retry attempts.
+        '''
+        self.task_status[ids] = status
+        if status == TASK_AVAILABLE:
+            for k in ('claim_time', 'attempts', 'retry_at'):
+                self.task_meta[k][ids] = TASK_META[k]
+
+    def group_tasks(self, names):
+        '''
+        Group tasks sharing the same values for parameters in `names`.
+
+        Returns the distinct values and value index of each task for every
+         parameter (see `ParamGrid.axis_codes`), the id of the first task of
+         each group and the group of each task (see `ParamGrid.groups`).
+        '''
+        labels, codes = zip(*[self.task_params.axis_codes(n) for n in names])
+        first, inv = self.task_params.groups(names)
+        return labels, codes, first, inv
+
+    def estimate_runtimes(self, names=None):
+        '''
+        Estimate the runtime of each task from the mean runtime of finished
+         tasks sharing the same values for the parameters in `names`. Tasks
+         in groups without any finished task get the mean over all finished
+         tasks, or nan if no task has finished yet.
+        '''
+        runtime = self.task_meta['runtime']
+        done = ~np.isnan(runtime)
+        est = np.full(self.get_size(), np.nan)
+        if not np.any(done):
+            return est
+        est[:] = np.mean(runtime[done])
+
+        if names:
+            _, inv = self.task_params.groups(names)
+            total = np.bincount(inv, weights=np.where(done, runtime, 0.))
+            count = np.bincount(inv, weights=done)
+            known = count[inv] > 0
+            est[known] = total[inv][known] / count[inv][known]
+        return est
+
+    def status_by(self, names):
+        '''
+        Count tasks of each status, grouped by the values of the parameters
+         in `names`.
+
+        Returns a list with the parameter values of each group, and an array
+         of shape n_groups x 4 with the number of finished, failed, running
+         and available tasks in each group. Duplicate tasks of a buffet
+         created with `dedup` are only counted once.
+        '''
+        if self.task_params is None:
+            raise Exception("Uninitialized task_params, cannot group tasks"
+                " by parameters.")
+
+        labels, codes, first, inv = self.group_tasks(names)
+        n_groups = len(first)
+
+        # column of each status in the counts array
+        col = np.empty(4, dtype=np.intp)
+        col[np.array(STATUS_ORDER) - TASK_FAILED] = np.arange(4)
+        counts = np.bincount(inv * 4 + col[self.task_status - TASK_FAILED],
+            minlength=n_groups * 4).reshape(-1, 4)
+
+        keys = [tuple(grid.column_item(l, c[i]) for l, c in zip(labels, codes))
+            for i in first]
+        return keys, counts
+
+    def print_status(self, by=None):
         sz = self.get_size()
         print("Buffet %s: %i tasks finished, %i tasks failed, %i tasks running,"
             " and %i tasks available out of a total of %i tasks." %
@@ -339,5 +719,32 @@ class TaskBuffet:
             np.sum(self.task_status == TASK_AVAILABLE),
             sz))
 
+        if self.task_params is not None and \
+                self.task_params.task_map is not None:
+            print("%i duplicate tasks were collapsed, task ids and counts"
+                " refer to the %i distinct tasks." %
+                (len(self.task_params.task_map) - sz, sz))
+
+        if self.retry_policy_data is not None:
+            try:
+                policy = self.get_retry_policy()
+            except Exception as exc:
+                policy = "cannot be loaded here (%s)" % exc
+            print("Retry policy: %s" % (policy,))
+
+        if by is not None:
+            keys, counts = self.status_by(by)
+            for k, c in zip(keys, counts):
+                print("%s: %i finished, %i failed, %i running, %i available." %
+                    (", ".join("%s=%s" % (n, v) for n, v in zip(by, k)),
+                    *c))
+
     def get_size(self, ):
         return len(self.task_status)
+
+    def get_original_status(self):
+        '''
+        Returns the status of every task as originally defined, including
+         duplicates collapsed when the buffet was created with `dedup`.
+        '''
+        return self.task_params.expand(self.task_status)
@@ -1,65 +1,222 @@
 
 import argparse
+import csv
+import json
 import os
-import shutil
-import sys
+import re
+import time
 
 import numpy as np
 
 import task_buffet
-
-
-def buffet_cli(buffet_filename, reset_failed, reset_running, no_backup, print_task_id=None):
-    if reset_failed or reset_running:
-        modify_buffet = True
-    else:
-        modify_buffet = False
+from task_buffet import buffet as tb
+
+
+def buffet_cli(buffet_filename, reset_failed, reset_running, no_backup,
+        print_task_id=None, by=None, status=None, ids=None, where=None,
+        lease_age=None, set_status=None, export=None, undo=False):
+    '''
+    Apply all the requested operations to the buffet while holding its lock
+     once, and save it at most once. Exported tasks are written after the
+     lock is released.
+    '''
+    selectors = (status, ids, where, lease_age)
+    has_selector = any(s is not None for s in selectors)
+    if set_status is not None and not has_selector:
+        raise Exception("Refusing to set the status of all tasks, select"
+            " tasks with --status, --ids, --where or --lease-age.")
+
+    journal = buffet_filename + '.journal'
+    exported = None
 
     with task_buffet.TaskBuffet(buffet_filename) as buffet:
-        if not no_backup and modify_buffet:
-            shutil.copy(buffet_filename, buffet_filename + '.bkp')
+        changes = []
+        if undo:
+            undo_last_change(buffet, journal)
 
         if reset_failed:
-            failed = np.where(buffet.task_status == task_buffet.TASK_FAILED)[0]
-            print("Resetting failed jobs to available: %s" % failed)
-            buffet.task_status[failed] = task_buffet.TASK_AVAILABLE
-            buffet.dump_buffet()
-
+            changes.append((buffet.select(status=[task_buffet.TASK_FAILED]),
+                task_buffet.TASK_AVAILABLE))
         if reset_running:
-            run = np.where(buffet.task_status == task_buffet.TASK_RUNNING)[0]
-            print("Resetting running jobs to available: %s" % run)
-            buffet.task_status[run] = task_buffet.TASK_AVAILABLE
+            changes.append((buffet.select(status=[task_buffet.TASK_RUNNING]),
+                task_buffet.TASK_AVAILABLE))
+
+        if has_selector:
+            selected = buffet.select(*selectors)
+            print("Selected %i tasks." % len(selected))
+            if set_status is not None:
+                changes.append((selected, set_status))
+        else:
+            selected = np.arange(buffet.get_size())
+
+        if changes and not no_backup:
+            write_journal(buffet, journal,
+                np.unique(np.concatenate([sel for sel, _ in changes])))
+        for sel, new_status in changes:
+            print("Setting %i tasks to %s: %s" % (len(sel),
+                tb.STATUS_NAMES[new_status], summarize_ids(sel)))
+            buffet.set_status(sel, new_status)
+        if undo or changes:
             buffet.dump_buffet()
 
-        buffet.print_status()
+        buffet.print_status(by=by)
 
         if print_task_id is not None:
-            print(buffet.task_params[print_task_id])
+            tasks = buffet.task_params.records(print_task_id)
+            for i, t in zip(print_task_id, tasks):
+                print(i, dict(zip(tasks.dtype.names, t.tolist())))
+
+        if export is not None:
+            exported = (selected, buffet.task_status[selected],
+                buffet.task_params.take(selected), buffet.task_params.names)
+
+    if exported is not None:
+        export_tasks(export, *exported)
+        print("Exported %i tasks to %s." % (len(exported[0]), export))
 
     return 0
 
 
+def write_journal(buffet, journal, sel):
+    # incremental backup, one line per cli call with the previous state of
+    # the modified tasks
+    entry = {'time': time.time(), 'ids': sel.tolist(),
+        'status': buffet.task_status[sel].tolist(),
+        'meta': {k: v[sel].tolist() for k, v in buffet.task_meta.items()}}
+    with open(journal, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+
+
+def undo_last_change(buffet, journal):
+    if not os.path.exists(journal):
+        raise Exception("No journal found in %s, nothing to undo." % journal)
+    with open(journal) as f:
+        lines = f.readlines()
+    if len(lines) == 0:
+        raise Exception("Journal %s is empty, nothing to undo." % journal)
+
+    entry = json.loads(lines[-1])
+    ids = np.array(entry['ids'], dtype=int)
+    buffet.task_status[ids] = entry['status']
+    for k, v in entry['meta'].items():
+        if k in buffet.task_meta:
+            buffet.task_meta[k][ids] = v
+    print("Restored the status of %i tasks." % len(ids))
+
+    with open(journal, 'w') as f:
+        f.writelines(lines[:-1])
+
+
+def export_tasks(filename, ids, status, params, names):
+    columns = [ids.tolist(), [tb.STATUS_NAMES[s] for s in status]]
+    columns += [params[n].tolist() for n in names]
+    header = ['id', 'status'] + list(names)
+    rows = zip(*columns)
+
+    if filename.endswith('.csv'):
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+    else:
+        with open(filename, 'w') as f:
+            json.dump([dict(zip(header, r)) for r in rows], f, default=repr)
+
+
+def summarize_ids(ids, n=10):
+    if len(ids) <= n:
+        return str(ids.tolist())
+    return "[%s, ...]" % ", ".join(str(i) for i in ids[:n])
+
+
+def parse_ids(s):
+    # comma separated ids or inclusive ranges, e.g. 0-10,15
+    ids = []
+    for part in s.split(','):
+        if '-' in part:
+            start, end = part.split('-')
+            ids.append(np.arange(int(start), int(end) + 1))
+        else:
+            ids.append([int(part)])
+    return np.concatenate(ids).astype(int)
+
+
+def parse_status(s):
+    names = {v: k for k, v in tb.STATUS_NAMES.items()}
+    try:
+        return [names[n] for n in s.split(',')]
+    except KeyError as e:
+        raise argparse.ArgumentTypeError("Unknown status %s, must be one of"
+            " %s." % (e, ", ".join(names)))
+
+
+def parse_where(s):
+    match = re.match(r'^\s*(\w+)\s*(==|!=|<=|>=|<|>|=)\s*(.+?)\s*$', s)
+    if match is None:
+        raise argparse.ArgumentTypeError("Cannot parse predicate %s." % s)
+    name, op, value = match.groups()
+    if op == '=':
+        op = '=='
+    try:
+        value = json.loads(value)
+    except ValueError:
+        # anything that is not a number, list, etc. is a string
+        pass
+    return name, op, value
+
+
 def main():
     parser = argparse.ArgumentParser("task-buffet-cli")
     parser.add_argument("buffet_filename", help="Name of the file containing"
         " the buffet, will be locked and manipulated by this program. By"
         " default will print the status of buffet given in parameter.")
     parser.add_argument("--no-backup", action="store_true",
-        help="Skip backup saving step.")
+        help="Skip backup saving step. Backups only contain the previous"
+        " state of modified tasks, see --undo.")
     parser.add_argument("-f", action="store_true",
         help="Reset failed tasks.")
     parser.add_argument("-r", action="store_true",
         help="Reset running tasks.")
-
-    parser.add_argument("--print-task", type=int,
-        help="Print details for task id provided")
+    parser.add_argument("--undo", action="store_true",
+        help="Revert the last modification saved in the backup journal.")
+
+    parser.add_argument("--print-task", type=int, nargs="+",
+        help="Print details for the task ids provided")
+    parser.add_argument("--by", type=lambda s: s.split(","),
+        help="Comma separated parameter names, print the status of tasks"
+        " grouped by the values of these parameters. Duplicate tasks are"
+        " counted once.")
+
+    select = parser.add_argument_group("task selection", "Selectors are"
+        " combined, only tasks matching all of them are selected. For"
+        " buffets created with dedup, task ids (here and in --print-task) are"
+        " those of the canonical tasks, duplicates of a task share its id and"
+        " status.")
+    select.add_argument("--status", type=parse_status,
+        help="Comma separated status, among finished, failed, running and"
+        " available.")
+    select.add_argument("--ids", type=parse_ids,
+        help="Comma separated task ids or inclusive ranges, e.g. 0-10,15.")
+    select.add_argument("--where", type=parse_where, action="append",
+        help="Predicate on a task parameter, e.g. 'lr<=0.1' or"
+        " 'model=resnet'. Can be given many times.")
+    select.add_argument("--lease-age", type=float,
+        help="Running tasks claimed more than this many seconds ago.")
+
+    parser.add_argument("--set-status", type=lambda s: parse_status(s)[0],
+        help="Set the status of the selected tasks.")
+    parser.add_argument("--export",
+        help="Save the selected tasks (all tasks if none are selected) to a"
+        " .json or .csv file.")
 
     args = parser.parse_args()
 
     if not os.path.exists(args.buffet_filename):
         raise Exception("Given buffet %s does not exist." % args.buffet_filename)
 
-    buffet_cli(args.buffet_filename, args.f, args.r, args.no_backup, args.print_task)
+    buffet_cli(args.buffet_filename, args.f, args.r, args.no_backup,
+        args.print_task, args.by, args.status, args.ids, args.where,
+        args.lease_age, args.set_status, args.export, args.undo)
 
 
 if __name__ == '__main__':
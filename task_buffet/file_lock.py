@@ -14,15 +14,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import functools
 import os
-import sys
-import time
 import socket
 import time
-import urllib
-import uuid
-import warnings
-import functools
 
 
 class LockError(Exception):
@@ -118,7 +113,7 @@ class Locker:
         self.unique_name = os.path.join(dirname,
                                         "%s.%s.%s" % (self.hostname,
                                                        self.pid,
-                                                       uuid.uuid1().hex))
+                                                       os.urandom(16).hex()))
         self.timeout = timeout
 
     def acquire(self, timeout=None):
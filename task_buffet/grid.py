@@ -1,17 +1,32 @@
 # Copyright (C) 2015 Julien-Charles Levesque
 
+import numbers
+import operator
+
 import numpy as np
 
-from .util import tasks_eq
+from . import util
 
 
 class ParamGrid():
-    def __init__(self, names, values, meshgrid=False):
+    '''
+    Column oriented storage of task parameters. Each parameter is kept in a
+     numpy array of length `nvals`, with a typed dtype when all of its values
+     are numbers of the same kind, and an object array otherwise.
+
+    Indexing with an integer returns the task as a dictionary of parameters.
+     Indexing with a slice, a list/array of task ids or a boolean mask returns
+     a dictionary of columns for all the selected tasks at once.
+
+    If `dedup` is true, identical tasks are collapsed into one canonical task,
+     and `task_map` gives the canonical task id of each original task.
+    '''
+    def __init__(self, names, values, meshgrid=False, dedup=False):
         if meshgrid:
             param_grid = nd_meshgrid(*values)
             param_grid = [p.flatten() for p in param_grid]
         else:
-            param_grid = values
+            param_grid = [as_column(v) for v in values]
 
         self.names = names
         self.values = param_grid
@@ -19,22 +34,290 @@ class ParamGrid():
         assert(np.all([len(v) == self.nvals for v in self.values]))
 
         self.nparams = len(names)
+        self.task_map = None
+        self._axis_codes = {}
+        # groups of tasks used for runtime estimates and status counts, saved
+        # with the grid since they are needed on every claim
+        self._groups = {}
+        if dedup:
+            self.collapse_duplicates()
         self.shape = (self.nparams, self.nvals)
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_hashes', None)
+        # codes of object columns are costly to compute, so they are saved
+        # with the grid and reused by every worker opening the buffet
+        state['_axis_codes'] = {n: c for n, c in
+            self.__dict__.get('_axis_codes', {}).items()
+            if self.values[list(self.names).index(n)].dtype == object}
+        return state
+
+    def __setstate__(self, state):
+        # Grids pickled by older versions store their values as lists
+        self.__dict__.update(state)
+        self.values = [as_column(v) for v in self.values]
+        self.__dict__.setdefault('task_map', None)
+        self.__dict__.setdefault('_axis_codes', {})
+        self.__dict__.setdefault('_groups', {})
+
+    def __len__(self):
+        return self.nvals
+
     def __getitem__(self, i):
-        # Returns a dictionary with wrapped argument for position i
-        return {n:v[i] for n, v in zip(self.names, self.values)}
+        if isinstance(i, numbers.Integral):
+            # Returns a dictionary with wrapped argument for position i
+            return {n:column_item(v, i) for n, v in zip(self.names, self.values)}
+        else:
+            return self.take(i)
 
     def __iter__(self,):
         for i in range(self.nvals):
-            yield {n:v[i] for n, v in zip(self.names, self.values)}
+            yield self[i]
 
     def __eq__(self, comp):
-        comp_names = np.all(np.array(self.names) ==
-                    np.array(comp.names))
-        comp_values = np.all([np.all(tasks_eq(comp.values[i], self.values[i]))
-                       for i in range(self.nparams)])
-        return comp_names & comp_values
+        if not isinstance(comp, ParamGrid):
+            return False
+        if list(self.names) != list(comp.names) or self.nvals != comp.nvals:
+            return False
+        if (self.task_map is None) != (comp.task_map is None) or (
+                self.task_map is not None and
+                not np.array_equal(self.task_map, comp.task_map)):
+            return False
+        for a, b in zip(self.values, comp.values):
+            # typed columns are compared directly, otherwise rely on hashes,
+            # in both cases nan parameters are equal to themselves
+            if a.dtype != object and b.dtype != object:
+                if not np.array_equal(a, b, equal_nan=True):
+                    return False
+            else:
+                h_a, h_b = joint_column_hashes(a, b)
+                if not np.array_equal(h_a, h_b):
+                    return False
+        return True
+
+    def task_hashes(self):
+        '''
+        Returns an array of uint64 with a stable hash for each task, computed
+         from the canonical serialization of its parameter names and values.
+         See `util.task_hash`.
+        '''
+        if getattr(self, '_hashes', None) is None:
+            h = np.zeros(self.nvals, dtype=np.uint64)
+            for n, v in zip(self.names, self.values):
+                h = util.combine_hashes(h, util.task_hash(n))
+                h = util.combine_hashes(h, util.column_hashes(v))
+            self._hashes = h
+        return self._hashes
+
+    def collapse_duplicates(self):
+        '''
+        Keep only the first occurrence of each distinct task, original task
+         ids are mapped to the remaining ones through `task_map`.
+        '''
+        h = self.task_hashes()
+        _, first, inv = np.unique(h, return_index=True, return_inverse=True)
+        keep = np.sort(first)
+        self.task_map = np.searchsorted(keep, first)[inv.ravel()]
+        self.values = [v[keep] for v in self.values]
+        self._axis_codes = {}
+        self._groups = {}
+        self.nvals = len(keep)
+        self.shape = (self.nparams, self.nvals)
+        self._hashes = h[keep]
+
+    def expand(self, arr):
+        '''
+        Fan out an array with one value per canonical task to all the original
+         tasks, duplicates included.
+        '''
+        arr = np.asarray(arr)
+        if self.task_map is None:
+            return arr
+        return arr[self.task_map]
+
+    def axis_codes(self, name):
+        '''
+        Returns the distinct values taken by parameter `name` and, for each
+         task, the index of its value among them. Computed once per grid.
+        '''
+        if name in self._axis_codes:
+            return self._axis_codes[name]
+
+        col = self.values[list(self.names).index(name)]
+        if col.dtype != object:
+            labels, codes = np.unique(col, return_inverse=True)
+            codes = codes.ravel()
+        elif all(type(v) is str for v in col):
+            # strings are compared exactly, number them in order of first
+            # appearance with a dictionary instead of hashing each of them
+            index = {}
+            codes = np.fromiter((index.setdefault(v, len(index)) for v in col),
+                dtype=np.intp, count=len(col))
+            labels = as_column(list(index))
+        else:
+            # objects are not orderable in general, group them by hash and
+            # keep the order in which values first appear
+            _, first, inv = np.unique(util.column_hashes(col),
+                return_index=True, return_inverse=True)
+            order = np.argsort(first)
+            rank = np.empty(len(order), dtype=np.intp)
+            rank[order] = np.arange(len(order))
+            labels, codes = col[first[order]], rank[inv.ravel()]
+        self._axis_codes[name] = (labels, codes)
+        return labels, codes
+
+    def groups(self, names):
+        '''
+        Group tasks sharing the same values for parameters in `names`. Returns
+         the id of the first task of each group and the group of each task.
+         Computed once per grid.
+        '''
+        key = tuple(names)
+        if key in self._groups:
+            return self._groups[key]
+
+        labels, codes = zip(*[self.axis_codes(n) for n in names])
+        dims = [len(l) for l in labels]
+        try:
+            combined = np.ravel_multi_index(codes, dims)
+        except ValueError:
+            # too many combinations to number them all, only keep those seen
+            _, combined = np.unique(np.stack(codes, axis=1), axis=0,
+                return_inverse=True)
+            combined = combined.ravel()
+        _, first, inv = np.unique(combined, return_index=True,
+            return_inverse=True)
+        self._groups[key] = (first, inv.ravel())
+        return self._groups[key]
+
+    def compare(self, name, op, value):
+        '''
+        Returns a boolean mask of the tasks for which `param op value` holds,
+         with `op` one of ==, !=, <, <=, > or >=.
+        '''
+        col = self.values[list(self.names).index(name)]
+        if op in ('==', '!=') and col.dtype == object:
+            # same notion of equality as task comparisons, only the distinct
+            # values of the column need to be compared
+            labels, codes = self.axis_codes(name)
+            eq = np.array([util.tasks_eq(l, value) for l in labels],
+                dtype=bool)[codes]
+            return eq if op == '==' else ~eq
+        return np.asarray(COMPARISONS[op](col, value), dtype=bool)
+
+    def find(self, other):
+        '''
+        Returns the position of each task of grid `other` in this grid, or -1
+         for tasks that cannot be found.
+        '''
+        if list(self.names) != list(other.names):
+            return np.full(other.nvals, -1, dtype=np.intp)
+        if any(v.dtype == object for v in self.values + other.values):
+            # objects only comparable with == must be hashed together
+            h = np.zeros(self.nvals, dtype=np.uint64)
+            other_h = np.zeros(other.nvals, dtype=np.uint64)
+            for n, a, b in zip(self.names, self.values, other.values):
+                n_h = util.task_hash(n)
+                h_a, h_b = joint_column_hashes(a, b)
+                h = util.combine_hashes(util.combine_hashes(h, n_h), h_a)
+                other_h = util.combine_hashes(
+                    util.combine_hashes(other_h, n_h), h_b)
+        else:
+            h = self.task_hashes()
+            other_h = other.task_hashes()
+        order = np.argsort(h, kind='stable')
+        sorted_h = h[order]
+        pos = np.searchsorted(sorted_h, other_h)
+        pos[pos == len(h)] = 0
+        found = sorted_h[pos] == other_h if len(h) > 0 else \
+            np.zeros(len(other_h), dtype=bool)
+        return np.where(found, order[pos], -1)
+
+    def take(self, idx):
+        '''
+        Returns the parameters of many tasks at once as a dictionary mapping
+         each parameter name to a numpy array. `idx` can be a slice, a
+         sequence of task ids or a boolean mask.
+        '''
+        if not isinstance(idx, slice):
+            idx = np.asarray(idx)
+        return {n:v[idx] for n, v in zip(self.names, self.values)}
+
+    def records(self, idx=None):
+        '''
+        Returns the parameters of the tasks selected by `idx` (all tasks by
+         default) as a numpy record array, with one field per parameter.
+        '''
+        if idx is None:
+            idx = slice(None)
+        cols = self.take(idx)
+        return np.rec.fromarrays([cols[n] for n in self.names],
+            names=list(self.names))
+
+
+PYTHON_DTYPES = (np.dtype(bool), np.dtype(np.int64), np.dtype(np.float64))
+
+COMPARISONS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt,
+    '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+
+def as_column(values):
+    '''
+    Convert a sequence of parameter values to a 1d numpy array. Homogeneous
+     python booleans, integers or floats get a bool, int64 or float64 array,
+     numpy scalars sharing the same numeric dtype keep it, and everything else
+     is stored in an object array, one element per value.
+    '''
+    if isinstance(values, np.ndarray) and values.ndim == 1 and \
+            values.dtype.kind in 'biuf':
+        return values
+
+    values = list(values)
+    if len(values) > 0 and all(isinstance(v, np.generic) for v in values):
+        dtypes = set(v.dtype for v in values)
+        if len(dtypes) == 1 and values[0].dtype.kind in 'biuf':
+            return np.array(values, dtype=values[0].dtype)
+        values_types = ()
+    else:
+        values_types = ((bool, bool), (int, np.int64), (float, np.float64))
+
+    for kind, dtype in values_types:
+        # bools are also ints, make sure the column does not change the type
+        # of some of its values
+        if len(values) > 0 and all(isinstance(v, kind) and
+                (dtype is bool or not isinstance(v, bool)) for v in values):
+            try:
+                return np.array(values, dtype=dtype)
+            except OverflowError:
+                break
+
+    col = np.empty(len(values), dtype='object')
+    for i, v in enumerate(values):
+        col[i] = v
+    return col
+
+
+def joint_column_hashes(a, b):
+    '''
+    Hashes of the values of columns `a` and `b`, computed together so that
+     equal values get equal hashes in both even when they can only be
+     compared with ==, see `util.column_hashes`.
+    '''
+    if a.dtype != object and b.dtype != object:
+        return util.column_hashes(a), util.column_hashes(b)
+    h = util.column_hashes(np.concatenate([a.astype(object),
+        b.astype(object)]))
+    return h[:len(a)], h[len(a):]
+
+
+def column_item(col, i):
+    # Columns built from python values hold numpy scalars, give back plain
+    # python values to tasks, other numpy dtypes are kept as they are
+    v = col[i]
+    if col.dtype in PYTHON_DTYPES:
+        v = v.item()
+    return v
 
 
 def nd_meshgrid(*arrs):
@@ -50,9 +333,8 @@ def nd_meshgrid(*arrs):
     for i, arr in enumerate(arrs):
         slc = [1]*dim
         slc[i] = lens[i]
-        # create a numpy array of objects
-        arr2 = np.empty(len(arr), dtype='object')
-        arr2[:] = arr
+        # typed array for homogeneous numbers, array of objects otherwise
+        arr2 = as_column(arr)
         arr2 = arr2.reshape(slc)
         for j, sz in enumerate(lens):
             if j != i:
@@ -1,8 +1,14 @@
 import functools
-import psutil
+import struct
+
+import numpy as np
+
 
 def kill_proc_tree(pid, including_parent=True):
-    # util function to kill a process and its children
+    # util function to kill a process and its children, psutil is only needed
+    # here so only import it when actually used
+    import psutil
+
     parent = psutil.Process(pid)
     children = parent.children(recursive=True)
     for child in children:
@@ -14,52 +20,165 @@ def kill_proc_tree(pid, including_parent=True):
         parent.kill()
 
 
-# try to determine if tasks are identical, basically if they have the
-# same parameters they are deemed identical
-# recursive function
+# Tasks are compared through a canonical serialization of their parameters.
+# Two tasks are deemed identical if they have the same parameters, with the
+# same conventions as python's `==` for numbers (1 == 1.0 == True) and with
+# lists, tuples and numpy arrays all treated as sequences. Other objects
+# (functions, instances of user classes, ...) cannot be serialized, only their
+# type and python hash enter the key and they are compared with `==`.
+def task_key(a):
+    '''
+    Returns a canonical bytes serialization of `a`, which can be a number,
+     a string, a nested list/tuple/dict, a numpy array or a
+     `functools.partial`. Equal tasks have equal keys, but objects of other
+     types with equal keys may still differ, see `tasks_eq`.
+    '''
+    return _task_key_leaves(a)[0]
+
+
+def task_hash(a):
+    '''
+    64 bits hash of the canonical serialization of `a`, see `task_key`.
+     Values with equal keys always get equal hashes. Identical across
+     processes and python sessions, unless `a` contains objects that cannot
+     be serialized, whose python hash is only valid in the current session.
+    '''
+    return _key_hash(task_key(a))
+
+
 def tasks_eq(a, b):
-    # TODO JCL: this is a mess and it shows that this method of `comparing tasks`
-    # is probably not viable, refactor this asap
-    if isinstance(a, str) or isinstance(b, str):
-        return a == b
-    elif isinstance(a, dict):
-        if not isinstance(b, dict):
-            return False
+    key_a, leaves_a = _task_key_leaves(a)
+    key_b, leaves_b = _task_key_leaves(b)
+    return key_a == key_b and _leaves_eq(leaves_a, leaves_b)
 
-        if len(a) != len(b):
-            return False
 
-        keys_a = list(a.keys())
-        keys_b = list(b.keys())
+def column_hashes(col):
+    '''
+    Returns an array of uint64 containing `task_hash` of each element of the
+     numpy array `col`. Typed columns only hash their unique values. Elements
+     with equal keys that are not equal according to `tasks_eq` get distinct
+     hashes, which are only consistent within the same column.
+    '''
+    if col.dtype != object:
+        uniq, inv = np.unique(col, return_inverse=True)
+        h = np.array([task_hash(u.item()) for u in uniq], dtype=np.uint64)
+        return h[inv.ravel()]
 
-        # sort keys to be sure
-        keys_a.sort()
-        keys_b.sort()
+    h = np.empty(len(col), dtype=np.uint64)
+    distinct = {}
+    for i, v in enumerate(col):
+        key, leaves = _task_key_leaves(v)
+        h[i] = _key_hash(key)
+        if leaves:
+            # number the distinct values sharing this key, in order of
+            # appearance, the first one keeps the hash of its key
+            reps = distinct.setdefault(key, [])
+            for j, r in enumerate(reps):
+                if _leaves_eq(r, leaves):
+                    break
+            else:
+                j = len(reps)
+                reps.append(leaves)
+            if j > 0:
+                h[i] = combine_hashes(h[i], j)
+    return h
 
-        # make sure keys are the same
-        if not tasks_eq(keys_a, keys_b):
-            return False
 
-        # compare values
-        for k in a:
-            if not tasks_eq(a[k], b[k]):
-                return False
-        return True
-    elif hasattr(a, '__len__'):
-        if not hasattr(b, '__len__'):
-            return False
+def combine_hashes(h, col_h):
+    # Vectorized mixing of two arrays of uint64 hashes, order dependent
+    h = np.asarray(h, dtype=np.uint64)
+    col_h = np.asarray(col_h, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        return _mix(h * np.uint64(0x100000001b3) ^ col_h)
 
-        if len(a) != len(b):
-            return False
 
-        for i in range(len(a)):
-            if not tasks_eq(a[i], b[i]):
+def _mix(x):
+    # splitmix64 finalizer, works on uint64 scalars and arrays
+    with np.errstate(over='ignore'):
+        x = np.asarray(x, dtype=np.uint64)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+        return x ^ (x >> np.uint64(31))
+
+
+def _key_hash(key):
+    import hashlib
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return struct.unpack('<Q', digest)[0]
+
+
+def _task_key_leaves(a):
+    # canonical key of `a` and the objects it contains which could not be
+    # serialized, in the order in which they appear in the key
+    out, leaves = [], []
+    _encode(a, out, leaves)
+    return b''.join(out), leaves
+
+
+def _leaves_eq(leaves_a, leaves_b):
+    if len(leaves_a) != len(leaves_b):
+        return False
+    for a, b in zip(leaves_a, leaves_b):
+        try:
+            if not (a is b or bool(a == b)):
                 return False
-        return True
-    elif isinstance(a, functools.partial):
-        if not isinstance(b, functools.partial):
+        except Exception:
             return False
+    return True
+
+
+def _is_number(a):
+    return isinstance(a, (int, float, np.integer, np.floating, np.bool_))
+
 
-        return tasks_eq(a.func, b.func) and tasks_eq(a.args, b.args)
+def _encode(a, out, leaves):
+    if isinstance(a, str):
+        b = a.encode('utf-8')
+        out.append(b's%d:' % len(b))
+        out.append(b)
+    elif isinstance(a, (bytes, bytearray)):
+        out.append(b'b%d:' % len(a))
+        out.append(bytes(a))
+    elif a is None:
+        out.append(b'N')
+    elif _is_number(a):
+        if isinstance(a, (float, np.floating)) and not a.is_integer():
+            out.append(b'f%s;' % float(a).hex().encode())
+        else:
+            out.append(b'i%d;' % int(a))
+    elif isinstance(a, dict):
+        items = sorted(((_task_key_leaves(k), v) for k, v in a.items()),
+            key=lambda kv: kv[0][0])
+        out.append(b'd%d:' % len(items))
+        for (k, k_leaves), v in items:
+            out.append(k)
+            leaves.extend(k_leaves)
+            _encode(v, out, leaves)
+    elif isinstance(a, functools.partial):
+        out.append(b'p')
+        _encode(a.func, out, leaves)
+        _encode(a.args, out, leaves)
+        _encode(a.keywords, out, leaves)
+    elif isinstance(a, np.ndarray) and a.ndim == 0:
+        _encode(a.item(), out, leaves)
+    elif isinstance(a, np.ndarray) and a.dtype.kind in 'biuf':
+        # numbers in a typed array, no need to go through numpy scalars
+        out.append(b'l%d:' % len(a))
+        for v in a.tolist():
+            _encode(v, out, leaves)
+    elif hasattr(a, '__len__') and hasattr(a, '__getitem__'):
+        out.append(b'l%d:' % len(a))
+        for i in range(len(a)):
+            _encode(a[i], out, leaves)
     else:
-        return a == b
+        # neither its repr nor its name identify an object (default reprs
+        # contain its address, closures and methods share their name), so
+        # keep its type and hash in the key and compare it with ==
+        t = type(a)
+        out.append(b'o')
+        _encode('%s.%s' % (t.__module__, t.__qualname__), out, leaves)
+        try:
+            out.append(b'%d;' % hash(a))
+        except TypeError:
+            out.append(b';')
+        leaves.append(a)